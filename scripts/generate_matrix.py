@@ -1,18 +1,37 @@
 # ruff: noqa: TRY003
 
+import bisect
+import contextlib
+import gzip
+import hashlib
+import heapq
 import importlib.metadata
+import itertools
 import json
-import subprocess  # noqa: S404
 import sys
+import time
 import urllib.error
 import urllib.request
-from functools import cache
-from typing import Any, Final, TypedDict, cast
-
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, lru_cache
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Final, NotRequired, TypedDict, cast
+
+from packaging.requirements import Requirement
 from packaging.specifiers import SpecifierSet
-from packaging.version import Version, parse
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version, parse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
-INDENT: Final = 4
+CACHE_DIR: Final = Path(__file__).resolve().parent.parent / ".cache" / "generate_matrix"
+CACHE_TTL: Final = 60 * 60  # seconds
+PYTHON_VERSIONS_URL: Final = "https://raw.githubusercontent.com/actions/python-versions/main/versions-manifest.json"
 PACKAGE_NAME: Final = "scipy"
 DEPENDENCY_NAME: Final = "numpy"
 MIN_VERSIONS: Final = (
@@ -20,26 +39,74 @@ MIN_VERSIONS: Final = (
     (Version("3.12"), Version("1.26")),
     (Version("3.13"), Version("2.1")),
 )
+# `(major, minor)` tuples of `MIN_VERSIONS`, which are much cheaper to compare
+MIN_VERSION_TUPLES: Final = tuple(
+    ((py_min.major, py_min.minor), (np_min.major, np_min.minor))
+    for py_min, np_min in MIN_VERSIONS
+)
 
+# `parse` is pure, and is often called with the same version strings
+_parse: Final = lru_cache(maxsize=4096)(parse)
+# most releases of a package share the same handful of 'requires_python' specifiers
+_specifier_set: Final = lru_cache(maxsize=256)(SpecifierSet)
 
-class UVPythonVersionParts(TypedDict):
-    major: int
-    minor: int
-    patch: int
 
+def _major_minor(version: str) -> tuple[int, int] | None:
+    """
+    Get the `(major, minor)` release segments of a version string.
 
-class UVPythonRelease(TypedDict):
-    name: str
-    version: str
-    version_parths: UVPythonVersionParts
-    path: str | None
-    symlink: str | None
-    url: str | None
-    os: str
-    variant: str
-    implementation: str
-    arch: str
-    libc: str
+    Well-formed versions like `"3.13.1"` or `"2.1.0rc1"` are split directly, which is a
+    lot cheaper than `parse`. Other versions, e.g. `"2.0rc1"`, fall back to `_parse`.
+
+    Args:
+        version (str): The version string.
+
+    Returns:
+        tuple[int, int] | None: The major and minor version, or `None` if invalid.
+
+    """
+    major, _, rest = version.partition(".")
+    minor = rest.split(".", 1)[0]
+    if major.isdecimal() and minor.isdecimal():
+        return int(major), int(minor)
+
+    try:
+        parsed = _parse(version)
+    except InvalidVersion:
+        return None
+    return parsed.major, parsed.minor
+
+
+def _newest_first(versions: Iterable[str]) -> Iterator[tuple[Version, str]]:
+    """
+    Lazily parse version strings, from newest to oldest.
+
+    Final releases like `"3.13.1"` are ordered by their integer segments, and are only
+    parsed once they're reached. Other (e.g. pre-release) versions are parsed upfront.
+    Invalid versions are skipped.
+
+    Args:
+        versions (Iterable[str]): The version strings.
+
+    Yields:
+        tuple[Version, str]: The parsed versions, together with their version strings.
+
+    """
+    finals: list[tuple[tuple[int, ...], str]] = []
+    others: list[tuple[Version, str]] = []
+    for version in versions:
+        segments = version.split(".")
+        if all(segment.isdecimal() for segment in segments):
+            finals.append((tuple(map(int, segments)), version))
+            continue
+        with contextlib.suppress(InvalidVersion):
+            others.append((_parse(version), version))
+
+    finals.sort(reverse=True)
+    others.sort(reverse=True)
+    yield from heapq.merge(
+        ((_parse(version), version) for _, version in finals), others, reverse=True
+    )
 
 
 class FileInfo(TypedDict, total=False):
@@ -58,8 +125,111 @@ class Release(TypedDict):
     files: list[FileInfo]
 
 
-class PackageVersions(TypedDict, total=False):
-    releases: dict[str, list[FileInfo]]
+# https://peps.python.org/pep-0691/#project-detail
+SimpleFile = TypedDict(
+    "SimpleFile",
+    {
+        "filename": str,
+        "url": str,
+        "hashes": dict[str, str],
+        "requires-python": NotRequired[str | None],
+        "yanked": NotRequired[bool | str],
+    },
+)
+
+
+class SimpleIndex(TypedDict):
+    name: str
+    files: list[SimpleFile]
+    versions: NotRequired[list[str]]
+
+
+def _json_loads(data: bytes) -> Any:
+    """
+    Deserialize JSON data, using `orjson` if available, and `json` otherwise.
+
+    Args:
+        data (bytes): The JSON document.
+
+    Returns:
+        Any: The deserialized data.
+
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(data: Any) -> bytes:
+    """
+    Compactly serialize data as JSON, using `orjson` if available, and `json` otherwise.
+
+    Args:
+        data (Any): The JSON-serializable data.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def _cache_is_fresh(path: Path) -> bool:
+    """
+    Check whether an on-disk cache file exists and is younger than `CACHE_TTL`.
+
+    Args:
+        path (Path): The cache file, as returned by `_cache_path`.
+
+    Returns:
+        bool: Whether the cache file can be used without revalidation.
+
+    """
+    try:
+        return time.time() - path.stat().st_mtime <= CACHE_TTL
+    except OSError:
+        return False
+
+
+def _cache_read(path: Path) -> Any | None:
+    """
+    Read JSON data from the on-disk cache, regardless of its age.
+
+    Args:
+        path (Path): The cache file, as returned by `_cache_path`.
+
+    Returns:
+        Any | None: The cached JSON data, or `None` if missing or corrupt.
+
+    """
+    try:
+        return _json_loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_write(path: Path, data: Any) -> None:
+    """
+    Atomically write JSON data to the on-disk cache. Failures are silently ignored.
+
+    Args:
+        path (Path): The cache file, as returned by `_cache_path`.
+        data (Any): The JSON-serializable data to store.
+
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        _ = tmp.write_bytes(_json_dumps(data))
+        _ = tmp.replace(path)
+    except OSError:
+        pass
 
 
 @cache
@@ -85,7 +255,7 @@ def get_package_minimum_python_version(package: str) -> Version:
             "Version specifier with upper bound not yet supported!"
         )
 
-    return parse(raw_version.replace(">=", "").replace("~=", ""))
+    return _parse(raw_version.replace(">=", "").replace("~=", ""))
 
 
 def get_dependency_minimum_version(package: str, dependency: str) -> Version:
@@ -108,32 +278,34 @@ def get_dependency_minimum_version(package: str, dependency: str) -> Version:
     if not requirements:
         raise ValueError(f"No requirements for {package}")
 
-    try:
-        # Find the first requirement that matches the dependency and is not an extra
-        dependency_req = next(
+    # Find the first requirement that matches the dependency and is not an extra
+    dependency_name = canonicalize_name(dependency)
+    dependency_req = next(
+        (
             req
-            for req in requirements
-            if req.startswith(dependency) and " extra " not in req
-        )
-    except StopIteration as e:
+            for req in map(Requirement, requirements)
+            if canonicalize_name(req.name) == dependency_name
+            and not (req.marker and "extra" in str(req.marker))
+        ),
+        None,
+    )
+    if dependency_req is None:
         raise ValueError(
             f"Dependency {dependency} not found in requirements for {package}"
-        ) from e
+        )
 
-        # Extract the version specifier (e.g., ">=1.21.0")
-    version_specifier = next(
-        (ver for ver in dependency_req.split(",") if ">" in ver), None
-    )
-    if version_specifier is None:
+    # The lowest version that is allowed by a lower bound, e.g. ">=1.21.0"
+    lower_bounds = [
+        _parse(spec.version.removesuffix(".*"))
+        for spec in dependency_req.specifier
+        if spec.operator in {">=", ">", "~=", "=="}
+    ]
+    if not lower_bounds:
         raise ValueError(
             f"No version specifier found for dependency {dependency} in {package}"
         )
 
-    # Remove dependency name and comparison operator to get the version
-    version_str = (
-        version_specifier.replace(dependency, "").replace(">=", "").replace(">", "")
-    )
-    return parse(version_str)
+    return min(lower_bounds)
 
 
 def get_available_python_versions(
@@ -155,58 +327,158 @@ def get_available_python_versions(
             A list of available Python versions satisfying the specified criteria.
 
     Raises:
-        urllib.error.URLError: If fetching data fails.
+        SystemExit: If fetching data fails.
 
     """
-    data_raw = subprocess.check_output(["uv", "python", "list", "--output-format=json"])  # noqa: S607
-    data = cast("list[UVPythonRelease]", json.loads(data_raw))
-
-    versions: dict[tuple[int, int], Version] = {}
+    data = cast("list[Release]", fetch_json(PYTHON_VERSIONS_URL))
 
+    # Group by minor series, so that only the latest version of each is parsed
+    min_tuple = MIN_VERSION_TUPLES[0][0]
+    groups: dict[tuple[int, int], list[str]] = {}
     for release in data:
-        if release["implementation"] != "cpython" or release["variant"] != "default":
-            continue
-
-        version = parse(release["version"])
-        if version.is_prerelease and not pre_releases:
+        if not release["stable"] and not pre_releases:
             continue
 
-        if min_version and version < min_version:
-            continue
-        if max_version and version > max_version:
+        key = _major_minor(release["version"])
+        if key is None or key < min_tuple:
             continue
 
-        version_tuple = version.major, version.minor
-        if version_tuple < MIN_VERSIONS[0][0].release[:2]:
-            continue
+        groups.setdefault(key, []).append(release["version"])
 
-        versions[version_tuple] = version
+    versions: list[Version] = []
+    for group in groups.values():
+        for version, _ in _newest_first(group):
+            if max_version and version > max_version:
+                continue
+            # Older versions of this minor series won't satisfy `min_version` either
+            if not min_version or version >= min_version:
+                versions.append(version)
+            break
 
-    return sorted(versions.values())
+    return sorted(versions)
 
 
-@cache
-def fetch_json(url: str) -> Any:
+@lru_cache(maxsize=32)
+def fetch_json(
+    url: str, accept: str = "application/json", check_content_type: bool = False
+) -> Any:
     """
     Fetch JSON data from a URL with caching.
 
+    Responses are cached in-process, and on disk in `CACHE_DIR` for `CACHE_TTL` seconds.
+    Expired responses are revalidated with a conditional request, using their `ETag`
+    and `Last-Modified` headers, so that unchanged data isn't downloaded again.
+
     Args:
         url (str): The URL to fetch.
+        accept (str): The media type to request through the `Accept` header.
+        check_content_type (bool):
+            Whether the `Content-Type` of the response must be `accept`. Servers may
+            ignore the `Accept` header, e.g. PyPI mirrors that only serve HTML.
 
     Returns:
         dict[str, Any] | list[Any]: The parsed JSON data.
 
     Raises:
-        urllib.error.URLError: If fetching data fails.
+        SystemExit: If fetching data fails.
 
     """
+    cache_path = _cache_path(f"{accept} {url}")
+    validators_path = cache_path.with_suffix(".headers.json")
+
+    cached = _cache_read(cache_path)
+    if cached is not None and _cache_is_fresh(cache_path):
+        return cached
+
+    headers = {"Accept": accept, "Accept-Encoding": "gzip"}
+    if cached is not None and (validators := _cache_read(validators_path)):
+        if etag := validators.get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := validators.get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+
+    request = urllib.request.Request(url, headers=headers)  # noqa: S310
     try:
-        with urllib.request.urlopen(url) as response:  # noqa: S310
-            return json.loads(response.read())
+        with urllib.request.urlopen(request) as response:  # noqa: S310
+            content_type = response.headers.get_content_type()
+            if check_content_type and content_type != accept:
+                error = f"{url}: unexpected Content-Type {content_type!r}"
+                print(error, file=sys.stderr)  # noqa: T201
+                sys.exit(1)
+
+            if response.headers.get("Content-Encoding") == "gzip":
+                with gzip.GzipFile(fileobj=response) as f:
+                    data = _json_loads(f.read())
+            else:
+                data = _json_loads(response.read())
+
+            validators = {
+                name: value
+                for name in ("ETag", "Last-Modified")
+                if (value := response.headers.get(name))
+            }
+    except urllib.error.HTTPError as e:
+        if e.code != HTTPStatus.NOT_MODIFIED or cached is None:
+            print(e, file=sys.stderr)  # noqa: T201
+            sys.exit(1)
+
+        # The cached data is still up-to-date, so we reset its TTL
+        with contextlib.suppress(OSError):
+            cache_path.touch()
+        return cached
     except urllib.error.URLError as e:
         print(e, file=sys.stderr)  # noqa: T201
         sys.exit(1)
 
+    _cache_write(cache_path, data)
+    _cache_write(validators_path, validators)
+    return data
+
+
+def fetch_simple(package_name: str) -> SimpleIndex:
+    """
+    Fetch the project page of a package from the JSON-based PyPI Simple API (PEP 691).
+
+    This is a lot smaller than the `/pypi/{package}/json` endpoint, as it only lists
+    the distribution files, and not the full project metadata of every release.
+
+    Args:
+        package_name (str): The name of the package on PyPI.
+
+    Returns:
+        SimpleIndex: The parsed project page.
+
+    """
+    url = f"https://pypi.org/simple/{package_name}/"
+    data = fetch_json(
+        url, "application/vnd.pypi.simple.v1+json", check_content_type=True
+    )
+    return cast("SimpleIndex", data)
+
+
+def _filename_version(filename: str) -> str | None:
+    """
+    Get the version string from the filename of a wheel or an sdist.
+
+    Args:
+        filename (str): The distribution filename, e.g. `"numpy-2.3.0.tar.gz"`.
+
+    Returns:
+        str | None: The (unnormalized) version string, or `None` for other files.
+
+    """
+    if filename.endswith(".whl"):
+        # {name}-{version}(-{build})?-{python}-{abi}-{platform}.whl
+        parts = filename.split("-")
+        return parts[1] if len(parts) >= 5 else None  # noqa: PLR2004
+
+    for extension in (".tar.gz", ".zip"):
+        if filename.endswith(extension):
+            # sdist names have no other dashes, except for the project name
+            return filename.removesuffix(extension).rpartition("-")[2] or None
+
+    return None
+
 
 def get_available_package_versions(
     package_name: str, min_version: Version, pre_releases: bool = False
@@ -229,34 +501,67 @@ def get_available_package_versions(
         RuntimeError: If no 'requires_python' is found for a package version.
 
     """
-    data: PackageVersions = fetch_json(f"https://pypi.org/pypi/{package_name}/json")
-
-    releases = data.get("releases", {})
-    latest_versions: dict[tuple[int, int], tuple[Version, str]] = {}
-    for version_str, release_files in releases.items():
-        version = parse(version_str)
-        if version < min_version or (version.is_prerelease and not pre_releases):
+    data = fetch_simple(package_name)
+    min_tuple = min_version.major, min_version.minor
+
+    # Group the 'requires-python' of each version by minor series, so that only the
+    # latest version of each series is parsed
+    groups: dict[tuple[int, int], dict[str, str]] = {}
+    for file_info in data["files"]:
+        # Skip files without 'requires-python'
+        requires_python = file_info.get("requires-python")
+        if not requires_python:
             continue
 
-            # Get 'requires_python' for this version
-        requires_python = None
-        for file_info in release_files:
-            if "requires_python" in file_info:
-                requires_python = file_info["requires_python"]
-                if requires_python:
-                    break
+        version_str = _filename_version(file_info["filename"])
+        if version_str is None:
+            continue
 
-        if requires_python is None:
-            # Skip versions without 'requires_python'
+        key = _major_minor(version_str)
+        if key is None or key < min_tuple:
             continue
 
-        key = version.major, version.minor
-        # Update to latest version within the minor version series
-        if key not in latest_versions or version > latest_versions[key][0]:
-            latest_versions[key] = version, requires_python
+        _ = groups.setdefault(key, {}).setdefault(version_str, requires_python)
+
+    latest_versions: dict[Version, str] = {}
+    for key, group in groups.items():
+        for version, version_str in _newest_first(group):
+            if version.is_prerelease and not pre_releases:
+                continue
+            # Older versions of this minor series won't satisfy `min_version` either
+            if key != min_tuple or version >= min_version:
+                latest_versions[version] = group[version_str]
+            break
 
-        # Extract the versions and requires_python from the latest_versions dict
-    return dict(latest_versions.values())
+    return latest_versions
+
+
+def get_minimum_dependency_versions(
+    python_versions: list[Version],
+) -> dict[Version, tuple[int, int]]:
+    """
+    Get the minimum `(major, minor)` dependency version for each Python version,
+    according to `MIN_VERSIONS`.
+
+    Args:
+        python_versions (list[Version]): The Python versions.
+
+    Returns:
+        dict[Version, tuple[int, int]]:
+            A mapping from each of the Python versions to the minimum compatible
+            dependency version, or `(0, 0)` if there is no lower bound.
+
+    """
+    min_versions = sorted(MIN_VERSION_TUPLES)
+    py_mins = [py_min for py_min, _ in min_versions]
+    # A later Python version is at least as restrictive as the ones before it
+    np_mins = list(itertools.accumulate((np_min for _, np_min in min_versions), max))
+
+    result: dict[Version, tuple[int, int]] = {}
+    for py_version in python_versions:
+        i = bisect.bisect_right(py_mins, (py_version.major, py_version.minor))
+        result[py_version] = np_mins[i - 1] if i else (0, 0)
+    return result
 
 
 def main() -> None:
@@ -276,32 +581,42 @@ def main() -> None:
 
     """
     min_py = get_package_minimum_python_version(PACKAGE_NAME)
-    versions_py = get_available_python_versions(min_py)
-
     min_np = get_dependency_minimum_version(PACKAGE_NAME, DEPENDENCY_NAME)
-    versions_np = get_available_package_versions(DEPENDENCY_NAME, min_np)
-
-    matrix_entries: list[dict[str, str]] = []
-    for np_version, py_requires in versions_np.items():
-        py_spec = SpecifierSet(py_requires)
-
-        for py_version in versions_py:
-            if py_version not in py_spec:
-                continue
 
-            # Skip incompatible combinations
-            if any(
-                py_version >= py_min and np_version < np_min
-                for py_min, np_min in MIN_VERSIONS
-            ):
-                continue
-
-            matrix_entries.append({
-                "python": f"{py_version.major}.{py_version.minor}",
-                DEPENDENCY_NAME: f"{np_version.major}.{np_version.minor}",
-            })  # fmt: skip
+    # these are independent and I/O-bound, so we fetch them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_py = executor.submit(get_available_python_versions, min_py)
+        future_np = executor.submit(
+            get_available_package_versions, DEPENDENCY_NAME, min_np
+        )
+        versions_py, versions_np = future_py.result(), future_np.result()
+
+    # Many releases share the same 'requires_python', so only evaluate each once
+    py_compatible = {
+        py_requires: list(_specifier_set(py_requires).filter(versions_py))
+        for py_requires in set(versions_np.values())
+    }
+    np_min_for_py = get_minimum_dependency_versions(versions_py)
+
+    matrix_entries = (
+        {
+            "python": f"{py_version.major}.{py_version.minor}",
+            DEPENDENCY_NAME: f"{np_version.major}.{np_version.minor}",
+        }
+        for np_version, py_requires in versions_np.items()
+        for py_version in py_compatible[py_requires]
+        # Skip incompatible combinations
+        if (np_version.major, np_version.minor) >= np_min_for_py[py_version]
+    )
 
-    json.dump({"include": matrix_entries}, indent=INDENT, fp=sys.stdout)
+    # Stream the entries as they are generated, instead of first collecting them
+    out = sys.stdout.buffer
+    _ = out.write(b'{"include":[')
+    for i, entry in enumerate(matrix_entries):
+        if i:
+            _ = out.write(b",")
+        _ = out.write(_json_dumps(entry))
+    _ = out.write(b"]}")
     _ = sys.stderr.flush()
     _ = sys.stdout.flush()
 